@@ -1,26 +1,47 @@
 import asyncio
+import functools
+import hashlib
+import hmac
+import io
 import json
+import logging
+import logging.handlers
 import os
+import queue
 import re
-import sys
+import secrets
 import uuid
 import zipfile
 import csv
 import subprocess
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from typing import BinaryIO, List, Dict, Any, Optional, Tuple
 
 from zoneinfo import ZoneInfo
 
 from aiogram import Bot, Dispatcher, F
+from aiogram.exceptions import TelegramAPIError
 from aiogram.filters import Command
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
 
 from playwright.async_api import async_playwright, Error as PlaywrightError
 
+try:
+    import uvloop  # optional: faster event loop on Linux/macOS
+except ImportError:
+    uvloop = None
+
+try:
+    import orjson  # optional: faster (de)serialization of the data/ JSON files
+except ImportError:
+    orjson = None
+
 # =========================
 # Configuration (hard-coded)
 # =========================
@@ -31,39 +52,108 @@ IST = ZoneInfo("Asia/Kolkata")
 
 PLAYWRIGHT_HEADLESS = True
 MAX_MEDIA = 4  # X allows up to 4 images or 1 video
+MAX_TWEET_LENGTH = 280
 TWEET_POST_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 2
 POSTING_TIMEOUT_SECONDS = 240
 BROWSER_INSTALL_TIMEOUT = 600
+TWEET_LINK_WAIT_TIME = 15  # seconds to wait for post confirmation
+BROWSER_CONCURRENCY = 4  # max simultaneous posting contexts in the shared Chromium
+MAX_ERROR_LEN = 200  # chars of an exception kept for storage/messages
+USER_TOUCH_INTERVAL = 60  # seconds between last_seen writes for the same user
+SCHEDULE_RECHECK_SECONDS = 60  # longest single sleep while waiting for a schedule
+SCHEDULE_MISFIRE_GRACE_SECONDS = 300  # on restart, still run schedules that were due this recently
+SHUTDOWN_TIMEOUT_SECONDS = 5  # how long shutdown waits for cancelled schedules to unwind
+POLLING_TIMEOUT = 50  # seconds Telegram may hold an idle getUpdates open
+TELEGRAM_MSG_LIMIT = 4000  # Telegram caps messages at 4096 chars
+
+# Webhook mode: set WEBHOOK_URL to the public HTTPS base URL that reaches this process
+# (e.g. behind a reverse proxy). Leave it empty to keep using long polling.
+WEBHOOK_URL = ""
+WEBHOOK_PATH = "/tg"
+WEBHOOK_LISTEN_HOST = "0.0.0.0"
+WEBHOOK_LISTEN_PORT = 8443
+WEBHOOK_SECRET = secrets.token_urlsafe(32)  # fresh per process; set_webhook re-registers it on every start
 
 # Paths
 BASE_DIR = Path(__file__).parent.resolve()
 DATA_DIR = BASE_DIR / "data"
-GLOBAL_LOGS = DATA_DIR / "logs.json"
+GLOBAL_LOGS = DATA_DIR / "logs.jsonl"
+LEGACY_GLOBAL_LOGS = DATA_DIR / "logs.json"
 USERS_FILE = DATA_DIR / "users.json"
 ADMINS_FILE = DATA_DIR / "admins.json"
+LOG_FILE = DATA_DIR / "bot.log"
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024  # bot.log rolls over at 5 MB
+LOG_FILE_BACKUPS = 3
 
 IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
 VIDEO_EXTS = {".mp4", ".mov", ".m4v", ".webm"}
 
+# Handlers run on a QueueListener thread so logging never blocks the event loop
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_log_queue_handler = logging.handlers.QueueHandler(_log_queue)
+# Records go straight to stderr until start_log_listener() swaps the root handler for the queue,
+# so importing this module without main() doesn't leave errors stuck in an undrained queue
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+logger = logging.getLogger("tweetbot")
+
 def ensure_dir(p: Path):
     p.mkdir(parents=True, exist_ok=True)
 
+def start_log_listener() -> logging.handlers.QueueListener:
+    """Attach the console and bot.log handlers to the log queue on a background thread."""
+    ensure_dir(DATA_DIR)
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [
+        logging.StreamHandler(),
+        logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding="utf-8"
+        ),
+    ]
+    for h in handlers:
+        h.setFormatter(formatter)
+    listener = logging.handlers.QueueListener(_log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(_log_queue_handler)
+    return listener
+
 def load_json(path: Path, default):
     try:
         if not path.exists():
             return default
-        with path.open("r", encoding="utf-8") as f:
-            return json.load(f)
+        raw = path.read_bytes()
+        return orjson.loads(raw) if orjson is not None else json.loads(raw)
     except Exception:
         return default
 
-def save_json(path: Path, data):
+def save_json(path: Path, data) -> bool:
     try:
         ensure_dir(path.parent)
-        with path.open("w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        if orjson is not None:
+            path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        else:
+            with path.open("w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+        return True
     except Exception as e:
-        print(f"Error saving JSON {path}: {e}", file=sys.stderr)
+        logger.error("Error saving JSON %s: %s", path, e)
+        return False
+
+def append_jsonl(path: Path, entry) -> bool:
+    """Append one JSON record as a line; the cost doesn't grow with the file."""
+    try:
+        ensure_dir(path.parent)
+        line = orjson.dumps(entry) if orjson is not None else json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        with path.open("ab") as f:
+            f.write(line + b"\n")
+        return True
+    except Exception as e:
+        logger.error("Error appending to %s: %s", path, e)
+        return False
 
 def now_ist() -> datetime:
     return datetime.now(IST)
@@ -74,24 +164,98 @@ def iso_ist(dt: Optional[datetime] = None) -> str:
 def human_ist(dt: datetime) -> str:
     return dt.astimezone(IST).strftime("%d %b %Y, %I:%M %p IST")
 
-def sanitize_filename(text: str) -> str:
-    return re.sub(r"[^a-zA-Z0-9._-]+", "_", text)[:100]
+@functools.lru_cache(maxsize=8)
+def _human_ist_minute(minute_epoch: int) -> str:
+    return human_ist(datetime.fromtimestamp(minute_epoch * 60, IST))
+
+def human_ist_now() -> str:
+    # The format has minute resolution, so one strftime per minute is enough
+    return _human_ist_minute(int(time.time()) // 60)
+
+def short_error(e: BaseException) -> str:
+    # Playwright errors carry a multi-line call log; keep the first line, bounded
+    text = str(e).strip().partition("\n")[0]
+    return text if len(text) <= MAX_ERROR_LEN else text[:MAX_ERROR_LEN - 1] + "…"
+
+_USER_DIRS: Dict[int, Path] = {}
 
 def user_dir(user_id: int) -> Path:
-    p = DATA_DIR / str(user_id)
-    ensure_dir(p)
+    # Created once per process; every storage helper goes through here
+    p = _USER_DIRS.get(user_id)
+    if p is None:
+        p = DATA_DIR / str(user_id)
+        ensure_dir(p)
+        _USER_DIRS[user_id] = p
     return p
 
 def user_file(user_id: int, name: str) -> Path:
     return user_dir(user_id) / name
 
 def append_global_log(entry: Dict[str, Any]):
-    logs = load_json(GLOBAL_LOGS, [])
-    logs.append(entry)
-    save_json(GLOBAL_LOGS, logs)
+    append_jsonl(GLOBAL_LOGS, entry)
+
+def migrate_global_log():
+    """
+    One-time move of the old logs.json array into logs.jsonl (kept in order, ahead of new lines).
+    The old file is renamed to logs.json.migrated only after logs.jsonl has been replaced.
+    """
+    if not LEGACY_GLOBAL_LOGS.exists():
+        return
+    try:
+        raw = LEGACY_GLOBAL_LOGS.read_bytes()
+        old_entries = orjson.loads(raw) if orjson is not None else json.loads(raw)
+    except Exception as e:
+        logger.warning("Not migrating %s, it can't be parsed: %s", LEGACY_GLOBAL_LOGS, e)
+        return
+    if not isinstance(old_entries, list):
+        logger.warning("Not migrating %s, it is not a JSON list", LEGACY_GLOBAL_LOGS)
+        return
+    try:
+        existing = GLOBAL_LOGS.read_bytes() if GLOBAL_LOGS.exists() else b""
+        tmp = GLOBAL_LOGS.with_suffix(".jsonl.tmp")
+        if orjson is not None:
+            lines = [orjson.dumps(entry) for entry in old_entries]
+        else:
+            lines = [json.dumps(entry, ensure_ascii=False).encode("utf-8") for entry in old_entries]
+        with tmp.open("wb") as f:
+            for line in lines:
+                f.write(line + b"\n")
+            f.write(existing)
+        tmp.replace(GLOBAL_LOGS)
+        LEGACY_GLOBAL_LOGS.replace(LEGACY_GLOBAL_LOGS.with_suffix(".json.migrated"))
+        logger.info("Migrated %d log entries to %s", len(old_entries), GLOBAL_LOGS.name)
+    except Exception as e:
+        logger.error("Error migrating %s: %s", LEGACY_GLOBAL_LOGS, e)
+
+async def send_lines(send, header: str, lines: List[str]):
+    """
+    Send header + lines via `send(text)` as one message, splitting into several
+    messages (in order) only when the combined length would exceed TELEGRAM_MSG_LIMIT.
+    """
+    total = len(header) + sum(len(line) + 1 for line in lines)
+    if total <= TELEGRAM_MSG_LIMIT:
+        await send(header + "\n".join(lines))
+        return
+    prefix, chunk, size = header, [], len(header)
+    for line in lines:
+        if chunk and size + len(line) + 1 > TELEGRAM_MSG_LIMIT:
+            await send(prefix + "\n".join(chunk))
+            prefix, chunk, size = "", [], 0
+        chunk.append(line)
+        size += len(line) + 1
+    if chunk:
+        await send(prefix + "\n".join(chunk))
+
+_ADMIN_ID_SET = frozenset(ADMIN_IDS)
+
+_APPROVAL_CODE_DIGEST = hashlib.sha256(USER_APPROVAL_CODE.encode()).digest()
+
+def check_approval_code(code: str) -> bool:
+    # Constant-time compare against the digest computed once at import
+    return hmac.compare_digest(hashlib.sha256(code.encode()).digest(), _APPROVAL_CODE_DIGEST)
 
 def is_admin(user_id: int) -> bool:
-    return user_id in ADMIN_IDS
+    return user_id in _ADMIN_ID_SET
 
 def _find_user(users: List[Dict[str, Any]], user_id: int) -> Optional[Dict[str, Any]]:
     for u in users:
@@ -102,22 +266,33 @@ def _find_user(users: List[Dict[str, Any]], user_id: int) -> Optional[Dict[str,
 def list_users() -> List[Dict[str, Any]]:
     return load_json(USERS_FILE, [])
 
+def _last_seen_stale(u: Dict[str, Any]) -> bool:
+    try:
+        last_seen = datetime.fromisoformat(u["last_seen"])
+    except (KeyError, TypeError, ValueError):
+        return True
+    return (now_ist() - last_seen).total_seconds() >= USER_TOUCH_INTERVAL
+
 def register_or_touch_user(user_id: int, first_name: str, username: Optional[str]) -> Dict[str, Any]:
     ensure_dir(DATA_DIR)
     users = load_json(USERS_FILE, [])
     existing = _find_user(users, user_id)
     if existing:
-        existing["first_name"] = first_name
-        existing["username"] = username
-        existing["last_seen"] = iso_ist()
-        save_json(USERS_FILE, users)
+        # Coalesce writes: only rewrite users.json when the profile changed or last_seen is stale
+        if (existing.get("first_name") != first_name or existing.get("username") != username
+                or _last_seen_stale(existing)):
+            existing["first_name"] = first_name
+            existing["username"] = username
+            existing["last_seen"] = iso_ist()
+            save_json(USERS_FILE, users)
         return existing
+    now = iso_ist()
     entry = {
         "user_id": user_id,
         "first_name": first_name,
         "username": username,
-        "joined_at": iso_ist(),
-        "last_seen": iso_ist(),
+        "joined_at": now,
+        "last_seen": now,
         "approved": True if is_admin(user_id) else False,
     }
     users.append(entry)
@@ -135,14 +310,9 @@ def set_user_approved(user_id: int, approved: bool):
 def is_user_approved(user_id: int) -> bool:
     users = load_json(USERS_FILE, [])
     u = _find_user(users, user_id)
-    return bool(u and u.get("approved"))
+    return bool(u and u.get("approved") and not u.get("blocked"))
 
 # Blocking users
-def is_user_blocked(user_id: int) -> bool:
-    users = load_json(USERS_FILE, [])
-    u = _find_user(users, user_id)
-    return bool(u and u.get("blocked"))
-
 def set_user_blocked(user_id: int):
     users = load_json(USERS_FILE, [])
     u = _find_user(users, user_id)
@@ -164,18 +334,40 @@ def set_user_unblocked(user_id: int):
     return True
 
 # Per-user storage
+# Parsed accounts.json per user, keyed by the file's (mtime_ns, size)
+_ACCOUNTS_CACHE: Dict[int, Tuple[Tuple[int, int], List[Dict[str, Any]]]] = {}
+
+def _file_key(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
 def load_accounts(user_id: int) -> List[Dict[str, Any]]:
-    return load_json(user_file(user_id, "accounts.json"), [])
+    path = user_file(user_id, "accounts.json")
+    key = _file_key(path)
+    cached = _ACCOUNTS_CACHE.get(user_id)
+    if key is not None and cached and cached[0] == key:
+        return cached[1]
+    accounts = load_json(path, [])
+    if key is not None:
+        _ACCOUNTS_CACHE[user_id] = (key, accounts)
+    return accounts
 
 def save_accounts(user_id: int, accounts: List[Dict[str, Any]]):
     for idx, acc in enumerate(accounts, start=1):
         acc["id"] = idx
-    save_json(user_file(user_id, "accounts.json"), accounts)
+    path = user_file(user_id, "accounts.json")
+    key = _file_key(path) if save_json(path, accounts) else None
+    if key is not None:
+        _ACCOUNTS_CACHE[user_id] = (key, accounts)
+    else:
+        _ACCOUNTS_CACHE.pop(user_id, None)
 
-def add_account(user_id: int, username: str, password: str) -> Dict[str, Any]:
-    accounts = load_accounts(user_id)
-    entry = {
-        "id": len(accounts) + 1,
+def _new_account_entry(account_id: int, username: str, password: str) -> Dict[str, Any]:
+    return {
+        "id": account_id,
         "username": username.strip(),
         "password": password.strip(),
         "added_at": iso_ist(),
@@ -183,20 +375,83 @@ def add_account(user_id: int, username: str, password: str) -> Dict[str, Any]:
         "last_status": "unknown",
         "last_error": None,
     }
-    accounts.append(entry)
+
+def _account_key(acc: Dict[str, Any]) -> str:
+    return acc["username"].strip().lower()
+
+def _dedup_accounts(accounts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop repeated usernames in one pass, keeping the first (oldest) entry."""
+    seen = set()
+    unique = []
+    for acc in accounts:
+        key = _account_key(acc)
+        if key not in seen:
+            seen.add(key)
+            unique.append(acc)
+    return unique
+
+def add_account(user_id: int, username: str, password: str) -> Tuple[Dict[str, Any], bool]:
+    """
+    Save one account, or update the password if the username is already saved.
+    Duplicates left over from older uploads are cleaned up on the same write.
+    Returns (entry, created).
+    """
+    accounts = _dedup_accounts(load_accounts(user_id))
+    key = username.strip().lower()
+    entry = next((a for a in accounts if _account_key(a) == key), None)
+    created = entry is None
+    if created:
+        entry = _new_account_entry(len(accounts) + 1, username, password)
+        accounts.append(entry)
+    else:
+        entry["password"] = password.strip()
     save_accounts(user_id, accounts)
-    return entry
+    return entry, created
+
+def add_accounts(user_id: int, credentials: List[Tuple[str, str]]) -> Tuple[int, int]:
+    """
+    Save many (username, password) pairs with a single load/save of accounts.json.
+    Usernames already saved get the new password, like add_account; within the batch the
+    last line for a username wins. Returns (added, updated).
+    """
+    accounts = _dedup_accounts(load_accounts(user_id))
+    by_key = {_account_key(a): a for a in accounts}
+    new_keys = set()
+    added = updated = 0
+    for username, password in credentials:
+        key = username.strip().lower()
+        entry = by_key.get(key)
+        if entry is None:
+            entry = _new_account_entry(len(accounts) + 1, username, password)
+            accounts.append(entry)
+            by_key[key] = entry
+            new_keys.add(key)
+            added += 1
+        elif entry["password"] != password.strip():
+            entry["password"] = password.strip()
+            if key not in new_keys:
+                updated += 1
+    if added or updated:
+        save_accounts(user_id, accounts)
+    return added, updated
 
 def update_account_status(user_id: int, username: str, status: str, error: Optional[str]):
+    update_account_statuses(user_id, {username: (status, error)})
+
+def update_account_statuses(user_id: int, updates: Dict[str, Tuple[str, Optional[str]]]):
+    """Apply {username: (status, error)} with a single load/save of accounts.json."""
     accounts = load_accounts(user_id)
+    by_username = {acc["username"]: acc for acc in reversed(accounts)}  # first match wins
+    used_at = iso_ist()
     changed = False
-    for acc in accounts:
-        if acc["username"] == username:
-            acc["last_used_at"] = iso_ist()
-            acc["last_status"] = status
-            acc["last_error"] = error
-            changed = True
-            break
+    for username, (status, error) in updates.items():
+        acc = by_username.get(username)
+        if acc is None:
+            continue
+        acc["last_used_at"] = used_at
+        acc["last_status"] = status
+        acc["last_error"] = error
+        changed = True
     if changed:
         save_accounts(user_id, accounts)
 
@@ -220,6 +475,21 @@ def add_tweet(user_id: int, text: str, media_paths: List[str]) -> Dict[str, Any]
     save_tweets(user_id, tweets)
     return entry
 
+def add_tweets(user_id: int, items: List[Tuple[str, List[str]]]) -> int:
+    """Append many (text, media_paths) tweets with a single load/save of tweets.json."""
+    tweets = load_tweets(user_id)
+    added_at = iso_ist()
+    for text, media_paths in items:
+        tweets.append({
+            "id": len(tweets) + 1,
+            "text": text,
+            "media": media_paths,
+            "added_at": added_at,
+        })
+    if items:
+        save_tweets(user_id, tweets)
+    return len(items)
+
 def load_used_tweets(user_id: int) -> List[int]:
     return load_json(user_file(user_id, "used_tweets.json"), [])
 
@@ -272,7 +542,7 @@ def update_schedule_status(user_id: int, schedule_id: str, status: str):
             break
     save_schedules(user_id, schedules)
 
-# Parse IST datetime, format: "3 August 2025 @12:31AM"
+# Parse IST datetime, format: "3 August 2025 @12:31AM" (ISO "2025-08-03 00:31" also accepted)
 MONTHS = {
     "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3,
     "april": 4, "apr": 4, "may": 5, "june": 6, "jun": 6,
@@ -283,7 +553,17 @@ MONTHS = {
 DT_REGEX = re.compile(r"^\s*(\d{1,2})\s+([A-Za-z]+)\s+(\d{4})\s*@\s*(\d{1,2}):(\d{2})\s*([AaPp][Mm])\s*$")
 
 def parse_ist_datetime(text: str) -> Optional[datetime]:
-    m = DT_REGEX.match(text.strip())
+    text = text.strip()
+    # Fast path for ISO input ("2025-08-03 00:31"): fromisoformat is a single C call
+    if text[:4].isdigit() and text[4:5] == "-":
+        if len(text) <= 10:
+            return None  # a bare date ("2025-08-03") would silently mean midnight
+        try:
+            dt = datetime.fromisoformat(text)
+        except ValueError:
+            return None
+        return dt.replace(tzinfo=IST) if dt.tzinfo is None else dt.astimezone(IST)
+    m = DT_REGEX.match(text)
     if not m:
         return None
     day = int(m.group(1))
@@ -312,13 +592,54 @@ async def ensure_playwright_installed():
     except Exception:
         pass
     try:
-        print("Installing Playwright Chromium...", flush=True)
+        logger.info("Installing Playwright Chromium...")
         subprocess.run(
             ["playwright", "install", "chromium", "--with-deps"],
             check=False, timeout=BROWSER_INSTALL_TIMEOUT
         )
     except Exception as e:
-        print(f"Error installing Playwright: {e}", file=sys.stderr)
+        logger.error("Error installing Playwright: %s", e)
+
+# Launch/context settings shared by posting and interactive login
+BROWSER_ARGS = ["--no-sandbox", "--disable-dev-shm-usage"]
+BROWSER_CONTEXT_OPTIONS = {
+    "locale": "en-US",
+    "viewport": {"width": 1280, "height": 900},
+    "user_agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+}
+
+# Shared Chromium instance for posting, launched on first use
+_PLAYWRIGHT = None
+_BROWSER = None
+_BROWSER_LOCK = asyncio.Lock()
+
+async def get_browser():
+    global _PLAYWRIGHT, _BROWSER
+    async with _BROWSER_LOCK:
+        if _BROWSER is None or not _BROWSER.is_connected():
+            await ensure_playwright_installed()
+            if _PLAYWRIGHT is None:
+                _PLAYWRIGHT = await async_playwright().start()
+            _BROWSER = await _PLAYWRIGHT.chromium.launch(
+                headless=PLAYWRIGHT_HEADLESS,
+                args=BROWSER_ARGS
+            )
+        return _BROWSER
+
+async def close_browser():
+    global _PLAYWRIGHT, _BROWSER
+    async with _BROWSER_LOCK:
+        if _BROWSER is not None:
+            try:
+                await _BROWSER.close()
+            except Exception:
+                pass
+        if _PLAYWRIGHT is not None:
+            try:
+                await _PLAYWRIGHT.stop()
+            except Exception:
+                pass
+        _PLAYWRIGHT = _BROWSER = None
 
 def split_media_paths(paths: List[str]) -> List[str]:
     imgs, vids = [], []
@@ -332,6 +653,53 @@ def split_media_paths(paths: List[str]) -> List[str]:
         return [vids[0]]
     return imgs[:MAX_MEDIA]
 
+# Comma-separated lists let Playwright match any variant in a single wait
+LOGGED_IN_SELECTOR = '[data-testid="SideNav_AccountSwitcher_Button"], [data-testid="tweetTextarea_0"], [aria-label="Post text"]'
+COMPOSER_SELECTOR = '[data-testid="tweetTextarea_0"], [aria-label="Post text"]'
+NEXT_BUTTON_SELECTOR = 'div[role="button"]:has-text("Next")'
+LOGIN_BUTTON_SELECTOR = 'div[role="button"]:has-text("Log in")'
+POST_BUTTON_SELECTOR = '[data-testid="tweetButtonInline"], [data-testid="tweetButton"], div[role="button"]:has-text("Tweet")'
+
+TWEET_URL_RE = re.compile(r"https?://(?:www\.)?(?:x|twitter)\.com/(?:i/web|[^/?#]+)/status/(\d+)")
+
+def extract_tweet_url(url: str) -> Optional[str]:
+    m = TWEET_URL_RE.search(url)
+    return f"https://x.com/i/status/{m.group(1)}" if m else None
+
+async def read_toast_tweet_url(page) -> Optional[str]:
+    """Pull the new tweet's link from the "post sent" toast, if it has one."""
+    link = page.locator('[data-testid="toast"] a[href*="/status/"]')
+    try:
+        if not await link.count():
+            return None
+        href = await link.first.get_attribute("href")
+    except PlaywrightError:
+        return None
+    return extract_tweet_url(f"https://x.com{href}" if href and href.startswith("/") else href or "")
+
+async def wait_for_post_confirmation(page) -> bool:
+    """
+    Wait until X navigates to the new status page or shows its "post sent" toast.
+    Both are event-driven waits, so whichever fires first ends the wait.
+    """
+    timeout_ms = TWEET_LINK_WAIT_TIME * 1000
+    waiters = {
+        asyncio.create_task(page.wait_for_url(TWEET_URL_RE, timeout=timeout_ms)),
+        asyncio.create_task(page.locator('[data-testid="toast"]').wait_for(state="visible", timeout=timeout_ms)),
+    }
+    pending = waiters
+    confirmed = False
+    try:
+        while pending and not confirmed:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            confirmed = any(t.exception() is None for t in done)
+    finally:
+        # Also runs when we are cancelled (posting timeout, shutdown), so no waiter is orphaned
+        for t in waiters:
+            t.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+    return confirmed
+
 async def post_tweet_via_playwright(
     account_username: str,
     account_password: str,
@@ -341,91 +709,125 @@ async def post_tweet_via_playwright(
     """
     Login to X and post a tweet. Returns (success, tweet_url, error_message).
     """
+    context = None
     try:
-        await ensure_playwright_installed()
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=PLAYWRIGHT_HEADLESS,
-                args=["--no-sandbox", "--disable-dev-shm-usage"]
-            )
-            context = await browser.new_context(
-                locale="en-US", viewport={"width": 1280, "height": 900},
-                user_agent="Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-            )
-            page = await context.new_page()
-            page.set_default_timeout(35000)
-            # Login
-            await page.goto("https://x.com/login", wait_until="domcontentloaded")
-            await page.wait_for_selector('input[name="text"]', timeout=20000)
+        # One shared browser; a fresh context per post keeps accounts' cookies apart
+        browser = await get_browser()
+        context = await browser.new_context(**BROWSER_CONTEXT_OPTIONS)
+        page = await context.new_page()
+        page.set_default_timeout(35000)
+        # Login
+        await page.goto("https://x.com/login", wait_until="domcontentloaded")
+        await page.wait_for_selector('input[name="text"]', timeout=20000)
+        await page.fill('input[name="text"]', account_username)
+        next_btn = page.locator(NEXT_BUTTON_SELECTOR)
+        if await next_btn.count():
+            await next_btn.first.click()
+        else:
+            await page.keyboard.press("Enter")
+        if await page.locator('input[name="text"]').count():
             await page.fill('input[name="text"]', account_username)
-            next_btn = page.locator('div[role="button"]:has-text("Next")')
-            if await next_btn.count():
-                await next_btn.first.click()
-            else:
-                await page.keyboard.press("Enter")
-            if await page.locator('input[name="text"]').count():
-                await page.fill('input[name="text"]', account_username)
-                next_btn2 = page.locator('div[role="button"]:has-text("Next")')
-                if await next_btn2.count():
-                    await next_btn2.first.click()
-                else:
-                    await page.keyboard.press("Enter")
-            await page.wait_for_selector('input[name="password"]', timeout=25000)
-            await page.fill('input[name="password"]', account_password)
-            login_btn = page.locator('div[role="button"]:has-text("Log in")')
-            if await login_btn.count():
-                await login_btn.first.click()
+            next_btn2 = page.locator(NEXT_BUTTON_SELECTOR)
+            if await next_btn2.count():
+                await next_btn2.first.click()
             else:
                 await page.keyboard.press("Enter")
-            # Check login success
+        await page.wait_for_selector('input[name="password"]', timeout=25000)
+        await page.fill('input[name="password"]', account_password)
+        login_btn = page.locator(LOGIN_BUTTON_SELECTOR)
+        if await login_btn.count():
+            await login_btn.first.click()
+        else:
+            await page.keyboard.press("Enter")
+        # Check login success
+        try:
+            await page.wait_for_selector(LOGGED_IN_SELECTOR, timeout=35000)
+        except PlaywrightError:
+            if await page.locator("text=Wrong password").count():
+                return False, None, "❌ Wrong password"
+            if await page.locator("text=Enter your phone number").count() or await page.locator("text=Verify").count():
+                return False, None, "❌ Verification required (2FA)"
+            return False, None, "❌ Login failed"
+        # Compose tweet
+        composer = page.locator(COMPOSER_SELECTOR)
+        if not await composer.count():
+            compose_btn = page.locator('[data-testid="SideNav_NewTweet_Button"]')
+            if await compose_btn.count():
+                await compose_btn.first.click()
             try:
-                await page.wait_for_selector('[data-testid="SideNav_AccountSwitcher_Button"], [data-testid="tweetTextarea_0"], [aria-label="Post text"]', timeout=35000)
+                # One wait covers every composer variant instead of probing them in turn
+                await composer.first.wait_for(timeout=10000)
             except PlaywrightError:
-                if await page.locator("text=Wrong password").count():
-                    return False, None, "❌ Wrong password"
-                if await page.locator("text=Enter your phone number").count() or await page.locator("text=Verify").count():
-                    return False, None, "❌ Verification required (2FA)"
-                return False, None, "❌ Login failed"
-            # Compose tweet
-            composer = page.locator('[data-testid="tweetTextarea_0"], [aria-label="Post text"]')
-            if not await composer.count():
-                compose_btn = page.locator('[data-testid="SideNav_NewTweet_Button"]')
-                if await compose_btn.count():
-                    await compose_btn.first.click()
-                    composer = page.locator('[data-testid="tweetTextarea_0"], [aria-label="Post text"]')
-            if not await composer.count():
                 return False, None, "❌ Tweet composer not found"
-            await composer.first.click()
-            if tweet_text:
-                await composer.first.type(tweet_text)
-            # Upload media
-            media_paths = split_media_paths([str(Path(p)) for p in media_paths])
-            for mp in media_paths:
-                input_file = page.locator('input[type="file"]')
-                try:
-                    await input_file.set_input_files(mp)
-                except Exception:
-                    pass
-            # Submit
-            post_btn = page.locator('div[role="button"]:has-text("Tweet")')
-            if await post_btn.count():
-                await post_btn.first.click()
-            else:
-                await page.keyboard.press("Meta+Enter")
-            # Wait for tweet to post
-            await asyncio.sleep(3)
-            # Try to get tweet URL
-            url = page.url
-            tweet_url = None
-            if "x.com/i/web/status" in url or "/status/" in url:
-                tweet_url = url
-            await context.close()
-            await browser.close()
-            return True, tweet_url, None
+        await composer.first.click()
+        if tweet_text:
+            await composer.first.type(tweet_text)
+        # Upload media
+        media_paths = split_media_paths([str(Path(p)) for p in media_paths])
+        for mp in media_paths:
+            input_file = page.locator('input[type="file"]')
+            try:
+                await input_file.set_input_files(mp)
+            except Exception:
+                pass
+        # Submit
+        post_btn = page.locator(POST_BUTTON_SELECTOR)
+        if await post_btn.count():
+            await post_btn.first.click()
+        else:
+            await page.keyboard.press("Meta+Enter")
+        # Wait for tweet to post
+        if not await wait_for_post_confirmation(page):
+            logger.warning("No post confirmation for @%s within %ss", account_username, TWEET_LINK_WAIT_TIME)
+        # The URL usually has it already; only query the DOM when it doesn't
+        tweet_url = extract_tweet_url(page.url)
+        if tweet_url is None:
+            tweet_url = await read_toast_tweet_url(page)
+        return True, tweet_url, None
     except Exception as e:
-        return False, None, f"❌ Error posting: {e}"
+        return False, None, f"❌ Error posting: {short_error(e)}"
+    finally:
+        if context is not None:
+            try:
+                await context.close()
+            except Exception:
+                pass
 
 async def post_next_tweet_for_user(bot: Bot, user_id: int, schedule_id: Optional[str] = None):
+    # Serialize per user so two schedules firing together can't pick the same tweet
+    async with user_lock(user_id):
+        await _post_next_tweet_locked(bot, user_id, schedule_id)
+
+async def _post_with_retries(account: Dict[str, Any], tweet: Dict[str, Any]) -> Tuple[bool, Optional[str], Optional[str]]:
+    """
+    Post one tweet from one account, retrying up to TWEET_POST_RETRIES times.
+    Each attempt holds a BROWSER_SEMAPHORE slot, i.e. one context in the shared browser.
+    """
+    last_error = None
+    for attempt in range(1, TWEET_POST_RETRIES + 1):
+        try:
+            async with BROWSER_SEMAPHORE:
+                ok, url, err = await asyncio.wait_for(
+                    post_tweet_via_playwright(
+                        account_username=account["username"],
+                        account_password=account["password"],
+                        tweet_text=tweet["text"],
+                        media_paths=tweet.get("media", []),
+                    ),
+                    timeout=POSTING_TIMEOUT_SECONDS
+                )
+            if ok:
+                return True, url, None
+            last_error = err
+        except asyncio.TimeoutError:
+            last_error = "Timeout posting"
+        except Exception as e:
+            last_error = short_error(e)
+        if attempt < TWEET_POST_RETRIES:
+            await asyncio.sleep(RETRY_BACKOFF_SECONDS)
+    return False, None, last_error
+
+async def _post_next_tweet_locked(bot: Bot, user_id: int, schedule_id: Optional[str]):
     tweets = load_tweets(user_id)
     used = set(load_used_tweets(user_id))
     next_tweet = None
@@ -446,76 +848,83 @@ async def post_next_tweet_for_user(bot: Bot, user_id: int, schedule_id: Optional
             update_schedule_status(user_id, schedule_id, "no_accounts")
         append_global_log({"ts": iso_ist(), "user_id": user_id, "action": "post", "result": "no_accounts", "tweet_id": next_tweet["id"]})
         return
+    if schedule_id:
+        # Persisted before any account posts, so a restart never re-runs a half-finished schedule
+        update_schedule_status(user_id, schedule_id, "running")
+    # Accounts post concurrently; BROWSER_SEMAPHORE caps how many contexts the shared browser has open
+    results = await asyncio.gather(*(_post_with_retries(account, next_tweet) for account in accounts))
     success_count = 0
-    tweet_url = None
+    links = []
     errors = []
-    for account in accounts:
-        last_error = None
-        account_success = False
-        account_url = None
-        # Try posting for each account with retries
-        for attempt in range(1, TWEET_POST_RETRIES + 1):
-            try:
-                account_success, account_url, err = await asyncio.wait_for(
-                    post_tweet_via_playwright(
-                        account_username=account["username"],
-                        account_password=account["password"],
-                        tweet_text=next_tweet["text"],
-                        media_paths=next_tweet.get("media", []),
-                    ),
-                    timeout=POSTING_TIMEOUT_SECONDS
-                )
-                last_error = err
-                if account_success:
-                    break
-            except asyncio.TimeoutError:
-                last_error = "Timeout posting"
-            except Exception as e:
-                last_error = str(e)
-            await asyncio.sleep(2)
+    statuses = {}
+    for account, (account_success, account_url, last_error) in zip(accounts, results):
         if account_success:
             success_count += 1
-            update_account_status(user_id, account["username"], "ok", None)
+            statuses[account["username"]] = ("ok", None)
             append_global_log({
                 "ts": iso_ist(), "user_id": user_id, "action": "post",
                 "result": "success", "details": {"tweet_id": next_tweet["id"], "account": account["username"], "url": account_url}
             })
-            if not tweet_url:
-                tweet_url = account_url
+            if account_url:
+                links.append(f"🔗 @{account['username']}: {account_url}")
         else:
-            update_account_status(user_id, account["username"], "failed", last_error)
+            statuses[account["username"]] = ("failed", last_error)
             append_global_log({
                 "ts": iso_ist(), "user_id": user_id, "action": "post",
                 "result": "failed", "tweet_id": next_tweet["id"], "account": account["username"], "error": last_error
             })
-            errors.append(last_error)
+            errors.append(f"@{account['username']}: {last_error}")
+    update_account_statuses(user_id, statuses)
+    # Report everything for this run in a single message
     if success_count > 0:
         mark_tweet_used(user_id, next_tweet["id"])
         if schedule_id:
             update_schedule_status(user_id, schedule_id, "completed")
-        msg = f"✅ Tweet posted successfully on {success_count}/{len(accounts)} accounts!"
-        if tweet_url:
-            msg += f" 🔗 {tweet_url}"
-        await bot.send_message(user_id, msg)
+        header = f"✅ Tweet posted successfully on {success_count}/{len(accounts)} accounts!"
     else:
         if schedule_id:
             update_schedule_status(user_id, schedule_id, "failed")
-        await bot.send_message(user_id, f"❌ Failed to post tweet on any account.")
+        header = "❌ Failed to post tweet on any account."
+    await send_lines(functools.partial(bot.send_message, user_id), header + "\n", links + errors)
+
+async def sleep_until(run_at: datetime):
+    """
+    Sleep until the wall-clock time run_at. The remaining time is re-checked at least every
+    SCHEDULE_RECHECK_SECONDS, so clock adjustments during a long wait don't make it fire early or late.
+    """
+    while True:
+        remaining = (run_at - now_ist()).total_seconds()
+        if remaining <= 0:
+            return
+        await asyncio.sleep(min(remaining, SCHEDULE_RECHECK_SECONDS))
 
 async def schedule_execution(bot: Bot, user_id: int, schedule_id: str, run_at: datetime):
     async def runner():
-        try:
-            delay = (run_at - now_ist()).total_seconds()
-            if delay > 0:
-                await asyncio.sleep(delay)
-            await post_next_tweet_for_user(bot, user_id, schedule_id)
-        finally:
-            SCHEDULE_TASKS.pop(schedule_id, None)
-    if schedule_id in SCHEDULE_TASKS and not SCHEDULE_TASKS[schedule_id].done():
-        SCHEDULE_TASKS[schedule_id].cancel()
-    SCHEDULE_TASKS[schedule_id] = asyncio.create_task(runner())
+        await sleep_until(run_at)
+        await post_next_tweet_for_user(bot, user_id, schedule_id)
+
+    def forget(task: asyncio.Task):
+        # Only drop the entry if it still points at this task (it may have been rescheduled)
+        if SCHEDULE_TASKS.get(schedule_id) is task:
+            del SCHEDULE_TASKS[schedule_id]
+
+    existing = SCHEDULE_TASKS.get(schedule_id)
+    if existing and not existing.done():
+        existing.cancel()
+    task = asyncio.create_task(runner())
+    task.add_done_callback(forget)
+    SCHEDULE_TASKS[schedule_id] = task
 
 SCHEDULE_TASKS: Dict[str, asyncio.Task] = {}
+# Caps open posting contexts in the shared browser, across all users and schedules
+BROWSER_SEMAPHORE = asyncio.Semaphore(BROWSER_CONCURRENCY)
+
+# Fixed pool of per-user locks (bucketed by user id) so memory stays bounded
+USER_LOCK_BUCKETS = 256
+USER_LOCKS = [asyncio.Lock() for _ in range(USER_LOCK_BUCKETS)]
+
+def user_lock(user_id: int) -> asyncio.Lock:
+    return USER_LOCKS[user_id % USER_LOCK_BUCKETS]
 
 # FSM States
 class ApprovalFlow(StatesGroup):
@@ -554,41 +963,89 @@ async def close_login_session(user_id: int):
         except Exception:
             pass
 
+@dp.startup()
+async def restore_schedules():
+    """
+    Re-arm schedules still pending from a previous run. Ones whose time passed less than
+    SCHEDULE_MISFIRE_GRACE_SECONDS ago fire right away; older ones are marked "missed".
+    Schedules that were mid-post when the bot stopped are marked "interrupted", never re-run,
+    since some accounts may already have posted the tweet.
+    """
+    now = now_ist()
+    restored = missed = interrupted = 0
+    for u in list_users():
+        user_id = u["user_id"]
+        schedules = load_schedules(user_id)
+        changed = False
+        for sched in schedules:
+            if sched.get("status") == "running":
+                sched["status"] = "interrupted"
+                changed = True
+                interrupted += 1
+                continue
+            if sched.get("status") != "pending":
+                continue
+            try:
+                run_at = datetime.fromisoformat(sched["run_at"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if (now - run_at).total_seconds() > SCHEDULE_MISFIRE_GRACE_SECONDS:
+                sched["status"] = "missed"
+                changed = True
+                missed += 1
+            else:
+                await schedule_execution(bot, user_id, sched["schedule_id"], run_at)
+                restored += 1
+        if changed:
+            save_schedules(user_id, schedules)
+    if restored or missed or interrupted:
+        logger.info("Schedules restored=%d missed=%d interrupted=%d", restored, missed, interrupted)
+
+@dp.shutdown()
+async def on_shutdown():
+    # Cancel waiting/running schedules together; posts in flight close their browser contexts
+    tasks = list(SCHEDULE_TASKS.values())
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.wait(tasks, timeout=SHUTDOWN_TIMEOUT_SECONDS)
+    # aiogram closes the bot session itself; close the browsers of unfinished 2FA logins
+    for uid in list(LOGIN_SESSIONS):
+        await close_login_session(uid)
+    await close_browser()
+
 async def start_interactive_login(user_id: int, username: str, password: str) -> Tuple[str, str]:
     try:
         await ensure_playwright_installed()
         pw = await async_playwright().start()
-        browser = await pw.chromium.launch(headless=PLAYWRIGHT_HEADLESS, args=["--no-sandbox", "--disable-dev-shm-usage"])
-        context = await browser.new_context(
-            locale="en-US", viewport={"width": 1280, "height": 900},
-            user_agent="Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36"
-        )
+        browser = await pw.chromium.launch(headless=PLAYWRIGHT_HEADLESS, args=BROWSER_ARGS)
+        context = await browser.new_context(**BROWSER_CONTEXT_OPTIONS)
         page = await context.new_page()
         page.set_default_timeout(35000)
         await page.goto("https://x.com/login", wait_until="domcontentloaded")
         await page.wait_for_selector('input[name="text"]', timeout=20000)
         await page.fill('input[name="text"]', username)
-        next_btn = page.locator('div[role="button"]:has-text("Next")')
+        next_btn = page.locator(NEXT_BUTTON_SELECTOR)
         if await next_btn.count():
             await next_btn.first.click()
         else:
             await page.keyboard.press("Enter")
         if await page.locator('input[name="text"]').count() and not await page.locator('input[name="password"]').count():
             await page.fill('input[name="text"]', username)
-            next_btn2 = page.locator('div[role="button"]:has-text("Next")')
+            next_btn2 = page.locator(NEXT_BUTTON_SELECTOR)
             if await next_btn2.count():
                 await next_btn2.first.click()
             else:
                 await page.keyboard.press("Enter")
         await page.wait_for_selector('input[name="password"]', timeout=25000)
         await page.fill('input[name="password"]', password)
-        login_btn = page.locator('div[role="button"]:has-text("Log in")')
+        login_btn = page.locator(LOGIN_BUTTON_SELECTOR)
         if await login_btn.count():
             await login_btn.first.click()
         else:
             await page.keyboard.press("Enter")
         try:
-            await page.wait_for_selector('[data-testid="SideNav_AccountSwitcher_Button"], [data-testid="tweetTextarea_0"], [aria-label="Post text"]', timeout=15000)
+            await page.wait_for_selector(LOGGED_IN_SELECTOR, timeout=15000)
             await context.close()
             await browser.close()
             await pw.stop()
@@ -608,7 +1065,7 @@ async def start_interactive_login(user_id: int, username: str, password: str) ->
             await context.close(); await browser.close(); await pw.stop()
             return "error", "Login failed (unknown reason)."
     except Exception as e:
-        return "error", f"Login error: {e}"
+        return "error", f"Login error: {short_error(e)}"
 
 async def submit_otp_code(user_id: int, code: str) -> Tuple[str, str]:
     sess = LOGIN_SESSIONS.get(user_id)
@@ -629,7 +1086,7 @@ async def submit_otp_code(user_id: int, code: str) -> Tuple[str, str]:
         else:
             await page.keyboard.press("Enter")
         try:
-            await page.wait_for_selector('[data-testid="SideNav_AccountSwitcher_Button"], [data-testid="tweetTextarea_0"], [aria-label="Post text"]', timeout=20000)
+            await page.wait_for_selector(LOGGED_IN_SELECTOR, timeout=20000)
             await context.close(); await browser.close(); await pw.stop()
             LOGIN_SESSIONS.pop(user_id, None)
             return "success", "2FA verification successful."
@@ -638,17 +1095,18 @@ async def submit_otp_code(user_id: int, code: str) -> Tuple[str, str]:
                 return "retry", "Incorrect code, try again."
             return "error", "2FA verification failed."
     except Exception as e:
-        return "error", f"Error submitting OTP: {e}"
+        return "error", f"Error submitting OTP: {short_error(e)}"
 
 async def ensure_allowed(message: Message, state: FSMContext) -> bool:
     uid = message.from_user.id
-    register_or_touch_user(uid, message.from_user.first_name, message.from_user.username)
+    # Reuse the record we just loaded instead of re-reading users.json per check
+    u = register_or_touch_user(uid, message.from_user.first_name, message.from_user.username)
     if is_admin(uid):
         return True
-    if is_user_blocked(uid):
+    if u.get("blocked"):
         await message.answer("🚫 You are blocked from using this bot.")
         return False
-    if is_user_approved(uid):
+    if u.get("approved"):
         return True
     await state.set_state(ApprovalFlow.waiting_code)
     await message.answer("🔑 Please enter the approval code to use this bot.")
@@ -670,7 +1128,7 @@ async def cmd_start(message: Message, state: FSMContext):
 @dp.message(ApprovalFlow.waiting_code, F.text)
 async def approval_code(message: Message, state: FSMContext):
     code = message.text.strip()
-    if code == USER_APPROVAL_CODE:
+    if check_approval_code(code):
         set_user_approved(message.from_user.id, True)
         await state.clear()
         await message.answer("✅ Approval successful! You can now use the bot. Type /help to see commands.")
@@ -691,7 +1149,7 @@ async def cmd_help(message: Message, state: FSMContext):
         "/accountlist - List your saved accounts\n"
         "/uploadtweetssingle - Add a single tweet (text + media)\n"
         "/uploadtweetbulk - Add tweets in bulk (.txt or text)\n"
-        "/schedule - Schedule a tweet (e.g. `/schedule 3 August 2025 @12:31AM`)\n"
+        "/schedule - Schedule a tweet (e.g. `/schedule 3 August 2025 @12:31AM` or `/schedule 2025-08-03 00:31`)\n"
         "/time - Show current IST time\n"
         "/status - Show current status of tasks\n"
         "/cancel - Cancel the current operation\n"
@@ -703,7 +1161,7 @@ async def cmd_help(message: Message, state: FSMContext):
 async def cmd_time(message: Message, state: FSMContext):
     if not await ensure_allowed(message, state):
         return
-    await message.answer(f"🕒 Current IST time: {human_ist(now_ist())}")
+    await message.answer(f"🕒 Current IST time: {human_ist_now()}")
 
 @dp.message(Command("cancel"))
 async def cmd_cancel(message: Message, state: FSMContext):
@@ -738,9 +1196,12 @@ async def addaccount_password(message: Message, state: FSMContext):
         await state.clear()
         await message.answer("❌ Invalid input. Please use /addaccount again.")
         return
-    entry = add_account(message.from_user.id, username, password)
+    entry, created = add_account(message.from_user.id, username, password)
     await state.clear()
-    await message.answer(f"✅ Added account ID {entry['id']}: @{entry['username']}")
+    if created:
+        await message.answer(f"✅ Added account ID {entry['id']}: @{entry['username']}")
+    else:
+        await message.answer(f"✅ Updated password for @{entry['username']} (account ID {entry['id']}).")
 
 @dp.message(Command("addaccounts"))
 async def cmd_addaccounts(message: Message, state: FSMContext):
@@ -772,10 +1233,13 @@ async def addaccounts_password(message: Message, state: FSMContext):
     await message.answer("⏳ Trying to log in... please wait.")
     status, msg = await start_interactive_login(message.from_user.id, username, password)
     if status == "success":
-        entry = add_account(message.from_user.id, username, password)
-        update_account_status(message.from_user.id, username, "ok", None)
+        entry, created = add_account(message.from_user.id, username, password)
+        update_account_status(message.from_user.id, entry["username"], "ok", None)
         await state.clear()
-        await message.answer(f"✅ Login successful. Account saved as ID {entry['id']} (@{username}).")
+        if created:
+            await message.answer(f"✅ Login successful. Account saved as ID {entry['id']} (@{username}).")
+        else:
+            await message.answer(f"✅ Login successful. Updated password for @{entry['username']} (account ID {entry['id']}).")
     elif status == "otp":
         await state.update_data(tmp_password=password)
         await state.set_state(AddAccounts2FAFlow.waiting_otp)
@@ -797,10 +1261,13 @@ async def addaccounts_otp(message: Message, state: FSMContext):
         data = await state.get_data()
         username = data.get("tmp_username")
         password = data.get("tmp_password")
-        entry = add_account(message.from_user.id, username, password)
-        update_account_status(message.from_user.id, username, "ok", None)
+        entry, created = add_account(message.from_user.id, username, password)
+        update_account_status(message.from_user.id, entry["username"], "ok", None)
         await state.clear()
-        await message.answer(f"✅ 2FA succeeded. Account saved as ID {entry['id']} (@{username}).")
+        if created:
+            await message.answer(f"✅ 2FA succeeded. Account saved as ID {entry['id']} (@{username}).")
+        else:
+            await message.answer(f"✅ 2FA succeeded. Updated password for @{entry['username']} (account ID {entry['id']}).")
     elif status == "retry":
         await message.answer(f"{msg} Send the code again or /cancel to stop.")
     else:
@@ -842,7 +1309,7 @@ async def cmd_listaccounts(message: Message, state: FSMContext):
         if err:
             line += f" | error={err}"
         lines.append(line)
-    await message.answer("💼 Your accounts:\n" + "\n".join(lines))
+    await send_lines(message.answer, "💼 Your accounts:\n", lines)
 
 @dp.message(Command("uploadtweets"))
 async def cmd_uploadtweets(message: Message, state: FSMContext):
@@ -929,13 +1396,21 @@ async def uploadtweets_bulk_text(message: Message, state: FSMContext):
         await state.clear()
         await message.answer("❌ No text provided.")
         return
-    blocks = [blk.strip() for blk in re.split(r"\n{2,}", text) if blk.strip()]
-    added = 0
-    for blk in blocks:
-        add_tweet(message.from_user.id, blk, [])
-        added += 1
+    items = []
+    long_count = 0
+    for blk in re.split(r"\n{2,}", text):
+        blk = blk.strip()
+        if not blk:
+            continue
+        items.append((blk, []))
+        if len(blk) > MAX_TWEET_LENGTH:
+            long_count += 1
+    added = add_tweets(message.from_user.id, items)
     await state.clear()
-    await message.answer(f"✅ Added {added} tweets from text.")
+    reply = f"✅ Added {added} tweets from text."
+    if long_count:
+        reply += f"\n⚠️ {long_count} of them exceed {MAX_TWEET_LENGTH} characters."
+    await message.answer(reply)
 
 @dp.message(F.document)
 async def handle_document_upload(message: Message, state: FSMContext):
@@ -951,123 +1426,115 @@ async def handle_document_upload(message: Message, state: FSMContext):
 
 async def process_accounts_file(message: Message):
     user_id = message.from_user.id
-    temp_path = user_file(user_id, f"tmp_{sanitize_filename(message.document.file_name)}")
-    ensure_dir(temp_path.parent)
+    # Download into memory; the file is parsed once and never needs to touch disk
+    buf = io.BytesIO()
     try:
-        await bot.download(message.document, destination=str(temp_path))
+        await bot.download(message.document, destination=buf)
     except Exception as e:
         await message.answer(f"❌ Failed to download file: {e}")
         return
-    added = 0
+    # Parse the whole file first, then commit it with one write
+    credentials = []
     try:
-        with open(temp_path, "r", encoding="utf-8", errors="ignore") as f:
+        with io.TextIOWrapper(buf, encoding="utf-8", errors="ignore") as f:
             for line in f:
                 line = line.strip()
                 if not line:
                     continue
-                if "," in line:
-                    u, p = line.split(",", 1)
-                elif ";" in line:
-                    u, p = line.split(";", 1)
-                else:
+                u, sep, p = line.partition(",")
+                if not sep:
+                    u, sep, p = line.partition(";")
+                if not sep:
                     continue
                 u, p = u.strip(), p.strip()
                 if u and p:
-                    add_account(user_id, u, p)
-                    added += 1
+                    credentials.append((u, p))
     except Exception as e:
         await message.answer(f"❌ Error reading file: {e}")
-    try:
-        temp_path.unlink(missing_ok=True)
-    except Exception:
-        pass
-    await message.answer(f"✅ Bulk add complete. Added {added} accounts.")
+        return
+    added, updated = add_accounts(user_id, credentials)
+    await message.answer(f"✅ Bulk add complete. Added {added} accounts, updated the password of {updated}.")
+
+class TweetPackageError(Exception):
+    """Uploaded tweets file can't be used; the message is shown to the user."""
+
+# tweets.csv layout: text,media1..media4
+CSV_MEDIA_COLUMNS = tuple(f"media{i}" for i in range(1, MAX_MEDIA + 1))
+
+def _read_tweets_txt(fh: BinaryIO) -> List[Tuple[str, List[str]]]:
+    with io.TextIOWrapper(fh, encoding="utf-8", errors="ignore") as f:
+        return [(text, []) for text in (line.strip() for line in f) if text]
+
+def _read_tweets_csv(fh: BinaryIO, media_root: Path) -> List[Tuple[str, List[str]]]:
+    items = []
+    with io.TextIOWrapper(fh, encoding="utf-8", errors="ignore", newline="") as f:
+        for row in csv.DictReader(f):
+            text = (row.get("text") or "").strip()
+            resolved = []
+            for col in CSV_MEDIA_COLUMNS:
+                m = (row.get(col) or "").strip()
+                if not m:
+                    continue
+                p = Path(m)
+                if not p.is_absolute():
+                    p = media_root / m
+                if p.exists():
+                    resolved.append(str(p))
+            items.append((text, split_media_paths(resolved)))
+    return items
+
+def read_tweets_package(user_id: int, name: str, data: BinaryIO) -> List[Tuple[str, List[str]]]:
+    """
+    Parse an uploaded .txt/.csv/.zip tweets file into (text, media_paths) pairs.
+    Does blocking disk and zip work, so callers run it via asyncio.to_thread.
+    """
+    if name.endswith(".txt"):
+        return _read_tweets_txt(data)
+    if name.endswith(".csv"):
+        return _read_tweets_csv(data, user_dir(user_id))
+    if name.endswith(".zip"):
+        extract_root = user_file(user_id, f"tweets_{uuid.uuid4().hex}")
+        ensure_dir(extract_root)
+        with zipfile.ZipFile(data, "r") as z:
+            z.extractall(extract_root)
+        csv_path = None
+        txt_path = None
+        for root, dirs, files in os.walk(extract_root):
+            for fn in files:
+                fl = fn.lower()
+                if fl == "tweets.csv" and csv_path is None:
+                    csv_path = Path(root) / fn
+                elif fl == "tweets.txt" and txt_path is None:
+                    txt_path = Path(root) / fn
+        if csv_path and csv_path.exists():
+            with open(csv_path, "rb") as fh:
+                return _read_tweets_csv(fh, csv_path.parent)
+        if txt_path and txt_path.exists():
+            with open(txt_path, "rb") as fh:
+                return _read_tweets_txt(fh)
+        raise TweetPackageError("❌ ZIP missing tweets.csv or tweets.txt.")
+    raise TweetPackageError("❌ Unsupported file type. Use .txt, .csv or .zip for tweets.")
 
 async def process_tweets_package(message: Message):
     user_id = message.from_user.id
     name = message.document.file_name.lower()
-    temp_path = user_file(user_id, f"tmp_{sanitize_filename(name)}")
-    ensure_dir(temp_path.parent)
+    # Keep the upload in memory; only zip contents (media) need to land on disk
+    buf = io.BytesIO()
     try:
-        await bot.download(message.document, destination=str(temp_path))
+        await bot.download(message.document, destination=buf)
     except Exception as e:
         await message.answer(f"❌ Failed to download file: {e}")
         return
     added = 0
     try:
-        if name.endswith(".txt"):
-            with open(temp_path, "r", encoding="utf-8", errors="ignore") as f:
-                for line in f:
-                    text = line.strip()
-                    if text:
-                        add_tweet(user_id, text, [])
-                        added += 1
-        elif name.endswith(".csv"):
-            with open(temp_path, "r", encoding="utf-8", errors="ignore") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    text = (row.get("text") or "").strip()
-                    media_cols = [row.get(f"media{i}", "").strip() for i in range(1,5)]
-                    media_cols = [m for m in media_cols if m]
-                    resolved = []
-                    for m in media_cols:
-                        p = Path(m)
-                        if not p.is_absolute():
-                            p = user_dir(user_id) / m
-                        if p.exists():
-                            resolved.append(str(p))
-                    add_tweet(user_id, text, split_media_paths(resolved))
-                    added += 1
-        elif name.endswith(".zip"):
-            extract_root = user_file(user_id, f"tweets_{uuid.uuid4().hex}")
-            ensure_dir(extract_root)
-            with zipfile.ZipFile(temp_path, "r") as z:
-                z.extractall(extract_root)
-            csv_path = None
-            txt_path = None
-            for root, dirs, files in os.walk(extract_root):
-                for fn in files:
-                    fl = fn.lower()
-                    if fl == "tweets.csv" and csv_path is None:
-                        csv_path = Path(root) / fn
-                    elif fl == "tweets.txt" and txt_path is None:
-                        txt_path = Path(root) / fn
-            if csv_path and csv_path.exists():
-                with open(csv_path, "r", encoding="utf-8", errors="ignore") as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        text = (row.get("text") or "").strip()
-                        media_cols = [row.get(f"media{i}", "").strip() for i in range(1,5)]
-                        media_cols = [m for m in media_cols if m]
-                        resolved = []
-                        for m in media_cols:
-                            p = Path(m)
-                            if not p.is_absolute():
-                                p = csv_path.parent / m
-                            if p.exists():
-                                resolved.append(str(p))
-                        add_tweet(user_id, text, split_media_paths(resolved))
-                        added += 1
-            elif txt_path and txt_path.exists():
-                with open(txt_path, "r", encoding="utf-8", errors="ignore") as f:
-                    for line in f:
-                        text = line.strip()
-                        if text:
-                            add_tweet(user_id, text, [])
-                            added += 1
-            else:
-                await message.answer("❌ ZIP missing tweets.csv or tweets.txt.")
-                return
-        else:
-            await message.answer("❌ Unsupported file type. Use .txt, .csv or .zip for tweets.")
-            return
+        # Parsing (and zip extraction) is blocking; keep it off the event loop
+        items = await asyncio.to_thread(read_tweets_package, user_id, name, buf)
+        added = add_tweets(user_id, items)
+    except TweetPackageError as e:
+        await message.answer(str(e))
+        return
     except Exception as e:
         await message.answer(f"❌ Error processing file: {e}")
-    finally:
-        try:
-            temp_path.unlink(missing_ok=True)
-        except Exception:
-            pass
     await message.answer(f"✅ Tweets added: {added}")
 
 @dp.message(Command("schedule"))
@@ -1078,13 +1545,13 @@ async def cmd_schedule(message: Message, state: FSMContext):
     if len(parts) > 1:
         dt = parse_ist_datetime(parts[1])
         if not dt:
-            await message.answer("❌ Invalid format. Example: `/schedule 3 August 2025 @12:31AM`", parse_mode="Markdown")
+            await message.answer("❌ Invalid format. Example: `/schedule 3 August 2025 @12:31AM` or `/schedule 2025-08-03 00:31`", parse_mode="Markdown")
             return
         entry = add_schedule(message.from_user.id, dt)
         await schedule_execution(bot, message.from_user.id, entry["schedule_id"], dt)
         await message.answer(f"⏰ Scheduled at {human_ist(dt)}. It will post the next unused tweet.", parse_mode="Markdown")
     else:
-        await message.answer("❌ Please provide date/time. Example: `/schedule 3 August 2025 @12:31AM`", parse_mode="Markdown")
+        await message.answer("❌ Please provide date/time. Example: `/schedule 3 August 2025 @12:31AM` or `/schedule 2025-08-03 00:31`", parse_mode="Markdown")
 
 @dp.message(Command("status"))
 async def cmd_status(message: Message, state: FSMContext):
@@ -1095,7 +1562,7 @@ async def cmd_status(message: Message, state: FSMContext):
     running_cnt = sum(1 for _ in SCHEDULE_TASKS)
     used = set(load_used_tweets(message.from_user.id))
     tweets = load_tweets(message.from_user.id)
-    remain = len([t for t in tweets if t['id'] not in used])
+    remain = sum(1 for t in tweets if t['id'] not in used)
     txt = []
     txt.append(f"📅 Pending schedules: {len(pending)}")
     for s in pending[:5]:
@@ -1137,8 +1604,9 @@ async def cmd_listusers(message: Message, state: FSMContext):
     if not users:
         await message.answer("No users yet.")
         return
-    lines = [f"{u['user_id']} | {u['first_name']} (@{u.get('username')}) | approved={u.get('approved')} | blocked={u.get('blocked', False)}" for u in users]
-    await message.answer("👥 Users:\n" + "\n".join(lines[:100]))
+    # Only format the users we actually show
+    lines = [f"{u['user_id']} | {u['first_name']} (@{u.get('username')}) | approved={u.get('approved')} | blocked={u.get('blocked', False)}" for u in users[:100]]
+    await send_lines(message.answer, "👥 Users:\n", lines)
 
 @dp.message(Command("viewaccounts"))
 @admin_only
@@ -1199,5 +1667,49 @@ async def cmd_broadcast(message: Message, state: FSMContext):
             pass
     await message.answer(f"Broadcast sent to {sent} users.")
 
+async def run_polling():
+    # A webhook left over from webhook mode would make getUpdates fail. If Telegram is unreachable
+    # right now, carry on: start_polling retries with backoff until the network is up.
+    try:
+        await bot.delete_webhook()
+    except TelegramAPIError as e:
+        logger.warning("Could not clear webhook before polling: %s", e)
+    # Only ask Telegram for update types we have handlers for
+    await dp.start_polling(bot, polling_timeout=POLLING_TIMEOUT, allowed_updates=dp.resolve_used_update_types())
+
+def build_webhook_app() -> web.Application:
+    """aiohttp app that receives Telegram's pushed updates at WEBHOOK_PATH."""
+    app = web.Application()
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=WEBHOOK_SECRET).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    async def set_webhook(_app: web.Application):
+        await bot.set_webhook(
+            WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+
+    # SimpleRequestHandler.register already closes the bot session on app shutdown
+    app.on_startup.append(set_webhook)
+    return app
+
+def main():
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    log_listener = start_log_listener()
+    logger.info(
+        "Starting bot: data_dir=%s mode=%s headless=%s browser_concurrency=%d admins=%s",
+        DATA_DIR, "webhook" if WEBHOOK_URL else "polling", PLAYWRIGHT_HEADLESS, BROWSER_CONCURRENCY, ADMIN_IDS,
+    )
+    migrate_global_log()
+    try:
+        if WEBHOOK_URL:
+            web.run_app(build_webhook_app(), host=WEBHOOK_LISTEN_HOST, port=WEBHOOK_LISTEN_PORT, print=None)
+        else:
+            asyncio.run(run_polling())
+    finally:
+        log_listener.stop()
+
 if __name__ == "__main__":
-    asyncio.run(dp.start_polling(bot))
+    main()